@@ -1,10 +1,12 @@
 # backend/glial/agent.py
 from logging import getLogger as get_logger
-from inspect import isawaitable
+from inspect import iscoroutinefunction
+import asyncio
 import logging
 import os
 
-from aiohttp import ClientSession
+from aiohttp import ClientSession, TCPConnector
+import msgspec
 
 from glial.streaming import stream_response
 from glial.tools.registry import gather_tools
@@ -15,48 +17,111 @@ _HEADERS = {
     "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}",
 }
 _MODEL = "gpt-5"
+_ENCODER = msgspec.json.Encoder(decimal_format="number")
+
+_READ_CHUNK = 64 * 1024
+
+_SHARED_SESSION = None
 
 logging.basicConfig(level=logging.INFO)
 
+
+def configure_loop():
+    """
+    Install uvloop as the asyncio event loop policy when it is available.
+    Call once at process startup, before the event loop is created.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+def _to_output(res):
+    """Tool result as output text: strings pass through, everything else is sent as JSON."""
+    if isinstance(res, str):
+        return res
+    try:
+        return _ENCODER.encode(res).decode()
+    except TypeError:
+        return str(res)
+
+
+def shared_session():
+    """
+    Process-wide ClientSession used by agents that aren't given one, so every
+    agent draws from the same keep-alive connection pool. Created on first use.
+    """
+    global _SHARED_SESSION
+    if _SHARED_SESSION is None or _SHARED_SESSION.closed:
+        _SHARED_SESSION = ClientSession(
+            connector=TCPConnector(limit=100, keepalive_timeout=60, ttl_dns_cache=300)
+        )
+    return _SHARED_SESSION
+
+
+async def close_shared_session():
+    global _SHARED_SESSION
+    if _SHARED_SESSION is not None:
+        await _SHARED_SESSION.close()
+        _SHARED_SESSION = None
+
+
 class Agent:
-    def __init__(self, on_delta):
+    def __init__(self, on_delta, session=None):
         self.log = get_logger(__name__)
-        self.locals = locals()
-        self.globals = globals()
+        self.exec_ns = {"__builtins__": __builtins__}  # persistent namespace for code_exec
         self.tool_schemas, self.tools = gather_tools(self)
+        self._async_tools = {name: iscoroutinefunction(func) for name, func in self.tools.items()}
         self.log.info("gathered tool_schemas[%s], tools[%s]", self.tool_schemas, self.tools)
-        self.session = ClientSession()
-        self.items = []  # running conversation items (JSON-serializable)
+        self.session = session or shared_session()  # not owned; never closed by the agent
+        # Everything after "input" is fixed per agent, so encode it once and splice
+        # it onto each request body.
+        self._body_tail = b"," + _ENCODER.encode({
+            "model": _MODEL,
+            "stream": True,
+            "reasoning": {"effort": "medium", "summary": "auto"},
+            "text": {"verbosity": "high"},
+            "tools": self.tool_schemas,
+        })[1:]
+        self.items = []  # running conversation items (dicts, or msgspec.Raw when seeded from storage)
+        # Upstream keeps the transcript between turns; after the first response we
+        # continue from its id and only send items appended since then.
+        self._last_response_id = None
+        self._sent_len = 0
         self.on_delta = on_delta
 
     async def __aenter__(self):
-        await self.session.__aenter__()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.session.__aexit__(exc_type, exc_val, exc_tb)
+        pass
 
     async def __call__(self, prompt: str):
         """
         Returns:
-          dict: { "total_tokens": int|None, "new_items": list[dict] }
+          dict: { "total_tokens": int|None, "new_items": list[tuple[str, dict]] }
+          new_items pairs each item added this turn with its storage role
+          (the item's "role", else its "type")
         """
-        # capture how many items existed before this turn
-        start_len = len(self.items)
         # add the user message as an item
-        self.items.append({"role": "user", "content": prompt})
+        item = {"role": "user", "content": prompt}
+        self.items.append(item)
+        new_items = [("user", item)]
 
         while True:
-            payload = {
-                "input": self.items,
-                "model": _MODEL,
-                "stream": True,
-                "reasoning": {"effort": "medium", "summary": "auto"},
-                "text": {"verbosity": "high"},
-                "tools": self.tool_schemas,
-            }
-
-            async with self.session.post(_URL, json=payload, headers=_HEADERS) as resp:
+            if self._last_response_id:
+                body = (
+                    b'{"input":' + _ENCODER.encode(self.items[self._sent_len:])
+                    + b',"previous_response_id":' + _ENCODER.encode(self._last_response_id)
+                    + self._body_tail
+                )
+            else:
+                body = b'{"input":' + _ENCODER.encode(self.items) + self._body_tail
+
+            async with self.session.post(_URL, data=body, headers=_HEADERS) as resp:
                 if resp.status >= 400:
                     try:
                         text = await resp.text()
@@ -67,43 +132,50 @@ class Agent:
                         resp.status, text, len(self.items)
                     )
                 resp.raise_for_status()
-                final = await stream_response(resp.content.iter_any(), on_delta=self.on_delta)
+                final = await stream_response(resp.content.iter_chunked(_READ_CHUNK), on_delta=self.on_delta)
                 self.log.debug("rcvd final[%s]", final)
 
-            # append model output items into our running transcript
+            # append model output items into our running transcript; upstream already has them
             for item in final.snapshot.output:
                 self.items.append(item)
+                new_items.append((item.get("role") or item.get("type") or "unknown", item))
+            self._last_response_id = final.snapshot.id
+            self._sent_len = len(self.items)
 
             # tool invocation loops
             if final.function_calls:
                 for fc in final.function_calls:
                     func, kwargs = self.tools[fc["name"]], fc["arguments"]
                     res = func(**kwargs)
-                    if isawaitable(res):
+                    if self._async_tools[fc["name"]]:
                         res = await res
-                    self.items.append({
+                    item = {
                         "type": "function_call_output",
                         "call_id": fc["call_id"],
-                        "output": str(res),
-                    })
+                        "output": _to_output(res),
+                    }
+                    self.items.append(item)
+                    new_items.append(("function_call_output", item))
             elif final.custom_tool_calls:
                 for ctc in final.custom_tool_calls:
                     func, input_data = self.tools[ctc["name"]], ctc["input"]
                     res = func(input_data)
-                    if isawaitable(res):
+                    if self._async_tools[ctc["name"]]:
                         res = await res
-                    self.items.append({
+                    item = {
                         "type": "custom_tool_call_output",
                         "call_id": ctc["call_id"],
-                        "output": str(res),
-                    })
+                        "output": _to_output(res),
+                    }
+                    self.items.append(item)
+                    new_items.append(("custom_tool_call_output", item))
             else:
-                # done for this round; compute delta items and return usage + new items
+                # done for this round; return usage + new items
                 total = None
                 try:
                     total = final.usage.get("total_tokens")
                 except Exception:
                     pass
-                new_items = self.items[start_len:]  # includes the user message and all assistant items from this round
+                # new_items includes the user message and all assistant items from this round
                 return {"total_tokens": total, "new_items": new_items}
 
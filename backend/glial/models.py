@@ -1,5 +1,4 @@
 from typing import Any, Dict, List, Literal, Optional, Union, Callable, Awaitable
-from dataclasses import dataclass, field
 import msgspec
 
 
@@ -58,6 +57,10 @@ class OutputTextPart(KWStruct):
 
 
 # ---------- Event variants ----------
+# Tags are the wire "type" strings and can't be renumbered; msgspec already
+# resolves them with a single hash lookup. Events the aggregator ignores only
+# declare their identifying fields, so the duplicated text/part payloads they
+# carry are skipped by the decoder instead of being materialized.
 class ResponseCreated(KWStruct, tag="response.created"):
     sequence_number: int
     response: ResponseCore
@@ -79,7 +82,6 @@ class ResponseReasoningSummaryPartAdded(KWStruct, tag="response.reasoning_summar
     item_id: str
     output_index: int
     summary_index: int
-    part: ReasoningSummaryPart
 
 
 class ResponseReasoningSummaryTextDelta(KWStruct, tag="response.reasoning_summary_text.delta"):
@@ -104,7 +106,6 @@ class ResponseReasoningSummaryPartDone(KWStruct, tag="response.reasoning_summary
     item_id: str
     output_index: int
     summary_index: int
-    part: ReasoningSummaryPart
 
 
 class ResponseOutputItemDone(KWStruct, tag="response.output_item.done"):
@@ -136,8 +137,6 @@ class ResponseOutputTextDone(KWStruct, tag="response.output_text.done"):
     item_id: str
     output_index: int
     content_index: int
-    text: str
-    logprobs: List[Any] = []
 
 
 class ResponseContentPartDone(KWStruct, tag="response.content_part.done"):
@@ -145,7 +144,6 @@ class ResponseContentPartDone(KWStruct, tag="response.content_part.done"):
     item_id: str
     output_index: int
     content_index: int
-    part: OutputTextPart
 
 
 # NEW: function call argument streaming
@@ -214,8 +212,7 @@ StreamEvent = (
 
 
 # Normalized delta for callbacks
-@dataclass
-class Delta:
+class Delta(KWStruct):
     kind: str
     output_index: Optional[int] = None
     item_id: Optional[str] = None
@@ -225,20 +222,19 @@ class Delta:
     name: Optional[str] = None
     call_id: Optional[str] = None
     status: Optional[str] = None
-    meta: Dict[str, Any] = field(default_factory=dict)
+    meta: Dict[str, Any] = {}
 
 
-@dataclass
-class AggregatedResponse:
+class AggregatedResponse(KWStruct):
     response_id: Optional[str] = None
     status: Optional[str] = None
     model: Optional[str] = None
     usage: Optional[Dict[str, Any]] = None
 
     text: str = ""
-    reasoning_summaries: List[str] = field(default_factory=list)
-    function_calls: List[Dict[str, Any]] = field(default_factory=list)
-    custom_tool_calls: List[Dict[str, Any]] = field(default_factory=list)
+    reasoning_summaries: List[str] = []
+    function_calls: List[Dict[str, Any]] = []
+    custom_tool_calls: List[Dict[str, Any]] = []
 
     snapshot: Optional[ResponseCore] = None
 
@@ -247,35 +243,31 @@ AnyDeltaCallback = Union[Callable[[Delta], None], Callable[[Delta], Awaitable[No
 
 
 # Internal per-item state
-@dataclass
-class _MessageState:
+class _MessageState(KWStruct):
     id: str
     output_index: int
     role: str = "assistant"
-    parts: Dict[int, List[str]] = field(default_factory=dict)  # content_index -> chunks
+    parts: Dict[int, List[str]] = {}  # content_index -> chunks
 
 
-@dataclass
-class _ReasoningState:
+class _ReasoningState(KWStruct):
     id: str
     output_index: int
-    summaries: Dict[int, List[str]] = field(default_factory=dict)  # summary_index -> chunks
+    summaries: Dict[int, List[str]] = {}  # summary_index -> chunks
 
 
-@dataclass
-class _FunctionCallState:
+class _FunctionCallState(KWStruct):
     id: str
     output_index: int
     name: str
     call_id: str
-    chunks: List[str] = field(default_factory=list)
+    chunks: List[str] = []
 
 
-@dataclass
-class _CustomToolCallState:
+class _CustomToolCallState(KWStruct):
     id: str
     output_index: int
     name: str
     call_id: str
-    chunks: List[str] = field(default_factory=list)
+    chunks: List[str] = []
 
@@ -1,5 +1,6 @@
-from typing import AsyncIterator, Optional, List, Dict, Any, Callable, Awaitable, Union
+from typing import AsyncIterator, Optional, List, Dict, Any, Callable, Awaitable, Union, TypeVar
 from dataclasses import dataclass, field
+import asyncio
 import inspect
 import json
 
@@ -17,246 +18,379 @@ from glial.models import (
 )
 
 
+# Untyped decoder for function-call arguments; tool signatures are applied by the caller.
+_ARGS_DECODER = msgspec.json.Decoder()
+
+
+T = TypeVar("T")
+_ItemState = Union[_MessageState, _ReasoningState, _FunctionCallState, _CustomToolCallState]
+
+
+async def _buffered(aiter: AsyncIterator[T], n: int = 4) -> AsyncIterator[T]:
+    """
+    Pull from `aiter` in a background task, staying up to `n` items ahead of the
+    consumer so reading and decoding overlap with slow delta callbacks.
+    """
+    queue: asyncio.Queue = asyncio.Queue(n)
+
+    async def pump():
+        try:
+            async for item in aiter:
+                await queue.put((True, item))
+        except Exception as e:
+            await queue.put((False, e))
+        else:
+            await queue.put((False, None))
+
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            ok, item = await queue.get()
+            if not ok:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        task.cancel()
+
+
+# Consumed bytes are only trimmed from the front of the buffer past this point.
+_COMPACT_AT = 64 * 1024
+
+
 class SSEDecoder:
     def __init__(self, encoding: str = "utf-8"):
-        self._buffer = ""
+        self._buffer = bytearray()
+        self._pos = 0  # read cursor into _buffer
         self._encoding = encoding
-        self._cur_event: Optional[str] = None
-        self._cur_data_lines: List[str] = []
+        # Nearly every event carries a single data: line, so keep the first one
+        # separately and only allocate a list for multi-line payloads. While a
+        # chunk is being parsed these are memoryview slices of _buffer.
+        self._cur_data: Optional[Union[bytes, memoryview]] = None
+        self._cur_data_extra: Optional[List[Union[bytes, memoryview]]] = None
         self._decoder = msgspec.json.Decoder(StreamEvent)
 
+    def _take_event(self) -> StreamEvent:
+        if self._cur_data_extra is None:
+            data = self._cur_data
+        else:
+            data = b"\n".join([self._cur_data, *self._cur_data_extra])  # type: ignore[list-item]
+        self._cur_data = None
+        self._cur_data_extra = None
+        try:
+            return self._decoder.decode(data)  # type: ignore[arg-type]
+        except msgspec.DecodeError:
+            raw = json.loads(bytes(data).decode(self._encoding, errors="replace"))  # type: ignore[arg-type]
+            return UnknownEvent(type=raw.get("type", "unknown"), __raw__=raw)
+
     async def iter_events(self, byte_iter: AsyncIterator[bytes]) -> AsyncIterator[StreamEvent]:
+        # Work on raw bytes end to end: msgspec validates UTF-8 itself and decodes
+        # straight from memoryview slices, so lines are never copied out of the
+        # buffer. Only the UnknownEvent fallback decodes to str.
+        buf = self._buffer
         async for chunk in byte_iter:
-            text = chunk.decode(self._encoding, errors="replace")
-            self._buffer += text
-
-            while True:
-                nl = self._buffer.find("\n")
-                if nl == -1:
-                    break
-                line = self._buffer[:nl]
-                self._buffer = self._buffer[nl + 1 :]
-
-                # Blank line indicates end of event
-                if line.strip() == "":
-                    if self._cur_data_lines:
-                        data_str = "\n".join(self._cur_data_lines)
-                        try:
-                            yield self._decoder.decode(data_str)
-                        except msgspec.DecodeError:
-                            data = json.loads(data_str)
-                            yield UnknownEvent(type=data.get("type", "unknown"), __raw__=data)
-                    self._cur_event = None
-                    self._cur_data_lines = []
-                    continue
-
-                if line.startswith("event:"):
-                    self._cur_event = line[len("event:") :].strip()
-                elif line.startswith("data:"):
-                    self._cur_data_lines.append(line[len("data:") :].lstrip())
-                else:
-                    if line.startswith(":"):
+            if self._pos == len(buf) or self._pos >= _COMPACT_AT:
+                del buf[: self._pos]
+                self._pos = 0
+            buf += chunk
+
+            view = memoryview(buf)
+            try:
+                pos = self._pos
+                while (nl := buf.find(b"\n", pos)) != -1:
+                    start, pos = pos, nl + 1
+
+                    # Dispatch uses the "type" field inside the JSON payload, so only
+                    # data: lines matter; event:, id:, retry: and comments are skipped.
+                    if buf.startswith(b"data:", start, nl):
+                        start += 5
+                        while start < nl and buf[start] == 0x20:
+                            start += 1
+                        if self._cur_data is None:
+                            self._cur_data = view[start:nl]
+                        elif self._cur_data_extra is None:
+                            self._cur_data_extra = [view[start:nl]]
+                        else:
+                            self._cur_data_extra.append(view[start:nl])
                         continue
-                    self._cur_data_lines.append(line)
+
+                    # Blank line (optionally CRLF) indicates end of event
+                    if nl - start > 1 or (nl > start and buf[start] != 0x0D):
+                        continue
+                    if self._cur_data is not None:
+                        self._pos = pos
+                        yield self._take_event()
+                self._pos = pos
+            finally:
+                # A partially received event must not keep _buffer exported, or
+                # the next resize would fail.
+                if self._cur_data is not None:
+                    self._cur_data = bytes(self._cur_data)
+                    if self._cur_data_extra is not None:
+                        self._cur_data_extra = [bytes(b) for b in self._cur_data_extra]
+                view.release()
 
 
 class ResponseAggregator:
     def __init__(self, on_delta: Optional[AnyDeltaCallback] = None):
         self.final = AggregatedResponse()
         self._on_delta = on_delta
-        self._msg: Dict[str, _MessageState] = {}
-        self._rsn: Dict[str, _ReasoningState] = {}
-        self._fn: Dict[str, _FunctionCallState] = {}
-        self._ct: Dict[str, _CustomToolCallState] = {}
-
-    async def _emit(self, d: Delta):
-        if self._on_delta is None:
-            return
-        res = self._on_delta(d)
-        if inspect.isawaitable(res):
+        # Callers without a callback (tests, batch runs) skip building Deltas entirely.
+        self._emit_enabled = on_delta is not None
+        # Resolve the callback kind once rather than inspecting every result
+        self._emit = self._emit_async if inspect.iscoroutinefunction(on_delta) else self._emit_sync
+        # Per-item state, indexed by output_index (slots stay None for untracked items)
+        self._items: List[Optional[_ItemState]] = []
+        # Output text deltas; joined into final.text once the stream ends
+        self._text_chunks: List[str] = []
+        # Event type -> handler; events without an entry are ignored.
+        self._dispatch: Dict[type, Callable[[Any], Awaitable[None]]] = {
+            ResponseCreated: self._h_created,
+            ResponseInProgress: self._h_in_progress,
+            ResponseOutputItemAdded: self._h_item_added,
+            ResponseContentPartAdded: self._h_content_part_added,
+            ResponseOutputTextDelta: self._h_text_delta,
+            ResponseReasoningSummaryTextDelta: self._h_reasoning_delta,
+            ResponseReasoningSummaryTextDone: self._h_reasoning_done,
+            ResponseFunctionCallArgumentsDelta: self._h_fn_args_delta,
+            ResponseFunctionCallArgumentsDone: self._h_fn_args_done,
+            ResponseCustomToolCallInputDelta: self._h_custom_input_delta,
+            ResponseCustomToolCallInputDone: self._h_custom_input_done,
+            ResponseOutputItemDone: self._h_item_done,
+            ResponseCompleted: self._h_completed,
+            UnknownEvent: self._h_unknown,
+        }
+        # UnknownEvent "type" -> handler taking the raw payload
+        self._unknown_dispatch: Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]] = {
+            "response.function_call_arguments.delta": self._u_fn_args_delta,
+            "response.function_call_arguments.done": self._u_fn_args_done,
+            "response.custom_tool_call_input.delta": self._u_custom_input_delta,
+            "response.custom_tool_call_input.done": self._u_custom_input_done,
+        }
+
+    async def _emit_async(self, d: Delta):
+        await self._on_delta(d)  # type: ignore[misc]
+
+    async def _emit_sync(self, d: Delta):
+        res = self._on_delta(d)  # type: ignore[misc]
+        # Plain callables returning an awaitable (partials, lambdas) still work
+        if res is not None and inspect.isawaitable(res):
             await res
 
+    def _set_item(self, oi: int, st: _ItemState):
+        items = self._items
+        if oi >= len(items):
+            items.extend([None] * (oi + 1 - len(items)))
+        items[oi] = st
+
+    def _item_state(self, oi: Optional[int], kind: type) -> Any:
+        try:
+            st = self._items[oi]  # type: ignore[index]
+        except (IndexError, TypeError):
+            return None
+        return st if type(st) is kind else None
+
     async def stream_from(self, byte_iter: AsyncIterator[bytes]) -> AggregatedResponse:
         decoder = SSEDecoder()
-        async for ev in decoder.iter_events(byte_iter):
-            match ev:
-                case ResponseCreated(response=resp):
-                    self.final.response_id = resp.id
-                    self.final.model = resp.model
-                    self.final.status = resp.status
-                    await self._emit(Delta(kind="response.status", status=resp.status))
-
-                case ResponseInProgress(response=resp):
-                    self.final.status = resp.status
-                    await self._emit(Delta(kind="response.status", status=resp.status))
-
-                case ResponseOutputItemAdded(output_index=oi, item=item):
-                    t = item.get("type")
-                    match t:
-                        case "message":
-                            st = _MessageState(id=item["id"], output_index=oi, role=item.get("role", "assistant"))
-                            self._msg[item["id"]] = st
-                            await self._emit(Delta(kind="item.started", output_index=oi, item_id=item["id"], meta={"type": "message"}))
-                        case "reasoning":
-                            st = _ReasoningState(id=item["id"], output_index=oi)
-                            self._rsn[item["id"]] = st
-                            await self._emit(Delta(kind="item.started", output_index=oi, item_id=item["id"], meta={"type": "reasoning"}))
-                        case "function_call":
-                            st = _FunctionCallState(
-                                id=item["id"],
-                                output_index=oi,
-                                name=item.get("name", ""),
-                                call_id=item.get("call_id", ""),
-                            )
-                            self._fn[item["id"]] = st
-                            await self._emit(Delta(kind="item.started", output_index=oi, item_id=item["id"], name=st.name, call_id=st.call_id, meta={"type": "function_call"}))
-                        case "custom_tool_call":
-                            st = _CustomToolCallState(
-                                id=item["id"],
-                                output_index=oi,
-                                name=item.get("name", ""),
-                                call_id=item.get("call_id", ""),
-                            )
-                            self._ct[item["id"]] = st
-                            await self._emit(Delta(kind="item.started", output_index=oi, item_id=item["id"], name=st.name, call_id=st.call_id, meta={"type": "custom_tool_call"}))
-                        case _:
-                            await self._emit(Delta(kind="item.started", output_index=oi, item_id=item.get("id"), meta={"type": t}))
-
-                case ResponseContentPartAdded(item_id=item_id, output_index=oi, content_index=ci):
-                    if (st := self._msg.get(item_id)) is not None:
-                        st.parts.setdefault(ci, [])
-
-                case ResponseOutputTextDelta(item_id=item_id, output_index=oi, content_index=ci, delta=chunk):
-                    if (st := self._msg.get(item_id)) is not None:
-                        st.parts.setdefault(ci, []).append(chunk)
-                    self.final.text += chunk
-                    await self._emit(Delta(kind="text", output_index=oi, item_id=item_id, content_index=ci, text=chunk))
-
-                case ResponseOutputTextDone():
-                    pass
-
-                case ResponseContentPartDone():
-                    pass
-
-                case ResponseReasoningSummaryTextDelta(item_id=item_id, output_index=oi, summary_index=si, delta=chunk):
-                    if (st := self._rsn.get(item_id)):
-                        st.summaries.setdefault(si, []).append(chunk)
-                    await self._emit(Delta(kind="reasoning", output_index=oi, item_id=item_id, summary_index=si, text=chunk))
-
-                case ResponseReasoningSummaryTextDone(text=full_text):
-                    self.final.reasoning_summaries.append(full_text)
-
-                # Typed function/custom tool events (if available)
-                case ResponseFunctionCallArgumentsDelta(item_id=item_id, output_index=oi, delta=chunk):
-                    if (st := self._fn.get(item_id)):
-                        st.chunks.append(chunk)
-                    await self._emit(Delta(kind="function.arguments", output_index=oi, item_id=item_id, text=chunk))
-
-                case ResponseFunctionCallArgumentsDone(item_id=item_id, output_index=oi, arguments=raw):  # type: ignore
-                    st = self._fn.get(item_id)
-                    try:
-                        parsed = json.loads(raw)
-                    except Exception:
-                        parsed = raw
-                    self.final.function_calls.append(
-                        {
-                            "id": item_id,
-                            "output_index": oi,
-                            "name": st.name if st else None,
-                            "call_id": st.call_id if st else None,
-                            "arguments": parsed,
-                            "arguments_raw": raw,
-                        }
-                    )
-
-                case ResponseCustomToolCallInputDelta(item_id=item_id, output_index=oi, delta=chunk):
-                    if (st := self._ct.get(item_id)):
-                        st.chunks.append(chunk)
-                    await self._emit(Delta(kind="custom.input", output_index=oi, item_id=item_id, text=chunk))
-
-                case ev if isinstance(ev, ResponseCustomToolCallInputDone):
-                    st = self._ct.get(ev.item_id)
-                    self.final.custom_tool_calls.append(
-                        {
-                            "id": ev.item_id,
-                            "output_index": ev.output_index,
-                            "name": st.name if st else None,
-                            "call_id": st.call_id if st else None,
-                            "input": ev.input
-                        }
-                    )
-
-                case ResponseOutputItemDone(output_index=oi, item=item):
-                    await self._emit(Delta(kind="item.completed", output_index=oi, item_id=item.get("id"), meta={"item": item}))
-
-                case ResponseCompleted(response=resp):
-                    self.final.snapshot = resp
-                    self.final.response_id = resp.id
-                    self.final.status = resp.status
-                    self.final.model = resp.model
-                    self.final.usage = resp.usage
-                    await self._emit(Delta(kind="response.status", status=resp.status))
-
-                # Fallback for when structs.py lacks the typed function/custom events
-                case UnknownEvent(type=typ, __raw__=raw):
-                    match typ:
-                        case "response.function_call_arguments.delta":
-                            item_id = raw.get("item_id")
-                            oi = raw.get("output_index")
-                            delta = raw.get("delta", "")
-                            if (st := self._fn.get(item_id)) is not None:
-                                st.chunks.append(delta)
-                            await self._emit(Delta(kind="function.arguments", output_index=oi, item_id=item_id, text=delta))
-                        case "response.function_call_arguments.done":
-                            item_id = raw.get("item_id")
-                            oi = raw.get("output_index")
-                            arguments = raw.get("arguments", "")
-                            st = self._fn.get(item_id)
-                            try:
-                                parsed = json.loads(arguments)
-                            except Exception:
-                                parsed = arguments
-                            self.final.function_calls.append(
-                                {
-                                    "id": item_id,
-                                    "output_index": oi,
-                                    "name": st.name if st else None,   # type: ignore[attr-defined]
-                                    "call_id": st.call_id if st else None,  # type: ignore[attr-defined]
-                                    "arguments": parsed,
-                                    "arguments_raw": arguments,
-                                }
-                            )
-                        case "response.custom_tool_call_input.delta":
-                            item_id = raw.get("item_id")
-                            oi = raw.get("output_index")
-                            delta = raw.get("delta", "")
-                            if (st := self._ct.get(item_id)) is not None:
-                                st.chunks.append(delta)
-                            await self._emit(Delta(kind="custom.input", output_index=oi, item_id=item_id, text=delta))
-                        case "response.custom_tool_call_input.done":
-                            item_id = raw.get("item_id")
-                            oi = raw.get("output_index")
-                            inp = raw.get("input", "")
-                            st = self._ct.get(item_id)
-                            self.final.custom_tool_calls.append(
-                                {
-                                    "id": item_id,
-                                    "output_index": oi,
-                                    "name": st.name if st else None,   # type: ignore[attr-defined]
-                                    "call_id": st.call_id if st else None,  # type: ignore[attr-defined]
-                                    "input": inp,
-                                }
-                            )
-                        case _:
-                            # Forward other unknowns for debugging if desired
-                            await self._emit(Delta(kind="unknown", meta=raw))
-
-                case _:
-                    # Unhandled event kind; ignore
-                    pass
+        dispatch = self._dispatch
+        async for ev in _buffered(decoder.iter_events(byte_iter), n=4):
+            handler = dispatch.get(type(ev))
+            if handler is not None:
+                await handler(ev)
 
+        self.final.text = "".join(self._text_chunks)
         return self.final
 
+    # ---------- Event handlers ----------
+    async def _h_created(self, ev: ResponseCreated):
+        resp = ev.response
+        self.final.response_id = resp.id
+        self.final.model = resp.model
+        self.final.status = resp.status
+        if self._emit_enabled:
+            await self._emit(Delta(kind="response.status", status=resp.status))
+
+    async def _h_in_progress(self, ev: ResponseInProgress):
+        self.final.status = ev.response.status
+        if self._emit_enabled:
+            await self._emit(Delta(kind="response.status", status=ev.response.status))
+
+    async def _h_item_added(self, ev: ResponseOutputItemAdded):
+        oi, item = ev.output_index, ev.item
+        t = item.get("type")
+        if t == "message":
+            st = _MessageState(id=item["id"], output_index=oi, role=item.get("role", "assistant"))
+            self._set_item(oi, st)
+            if self._emit_enabled:
+                await self._emit(Delta(kind="item.started", output_index=oi, item_id=item["id"], meta={"type": "message"}))
+        elif t == "reasoning":
+            st = _ReasoningState(id=item["id"], output_index=oi)
+            self._set_item(oi, st)
+            if self._emit_enabled:
+                await self._emit(Delta(kind="item.started", output_index=oi, item_id=item["id"], meta={"type": "reasoning"}))
+        elif t == "function_call":
+            st = _FunctionCallState(
+                id=item["id"],
+                output_index=oi,
+                name=item.get("name", ""),
+                call_id=item.get("call_id", ""),
+            )
+            self._set_item(oi, st)
+            if self._emit_enabled:
+                await self._emit(Delta(kind="item.started", output_index=oi, item_id=item["id"], name=st.name, call_id=st.call_id, meta={"type": "function_call"}))
+        elif t == "custom_tool_call":
+            st = _CustomToolCallState(
+                id=item["id"],
+                output_index=oi,
+                name=item.get("name", ""),
+                call_id=item.get("call_id", ""),
+            )
+            self._set_item(oi, st)
+            if self._emit_enabled:
+                await self._emit(Delta(kind="item.started", output_index=oi, item_id=item["id"], name=st.name, call_id=st.call_id, meta={"type": "custom_tool_call"}))
+        else:
+            if self._emit_enabled:
+                await self._emit(Delta(kind="item.started", output_index=oi, item_id=item.get("id"), meta={"type": t}))
+
+    async def _h_content_part_added(self, ev: ResponseContentPartAdded):
+        if (st := self._item_state(ev.output_index, _MessageState)) is not None:
+            st.parts.setdefault(ev.content_index, [])
+
+    async def _h_text_delta(self, ev: ResponseOutputTextDelta):
+        chunk = ev.delta
+        if (st := self._item_state(ev.output_index, _MessageState)) is not None:
+            st.parts.setdefault(ev.content_index, []).append(chunk)
+        self._text_chunks.append(chunk)
+        if self._emit_enabled:
+            await self._emit(Delta(kind="text", output_index=ev.output_index, item_id=ev.item_id, content_index=ev.content_index, text=chunk))
+
+    async def _h_reasoning_delta(self, ev: ResponseReasoningSummaryTextDelta):
+        chunk = ev.delta
+        if (st := self._item_state(ev.output_index, _ReasoningState)):
+            st.summaries.setdefault(ev.summary_index, []).append(chunk)
+        if self._emit_enabled:
+            await self._emit(Delta(kind="reasoning", output_index=ev.output_index, item_id=ev.item_id, summary_index=ev.summary_index, text=chunk))
+
+    async def _h_reasoning_done(self, ev: ResponseReasoningSummaryTextDone):
+        self.final.reasoning_summaries.append(ev.text)
+
+    async def _h_fn_args_delta(self, ev: ResponseFunctionCallArgumentsDelta):
+        if (st := self._item_state(ev.output_index, _FunctionCallState)):
+            st.chunks.append(ev.delta)
+        if self._emit_enabled:
+            await self._emit(Delta(kind="function.arguments", output_index=ev.output_index, item_id=ev.item_id, text=ev.delta))
+
+    async def _h_fn_args_done(self, ev: ResponseFunctionCallArgumentsDone):
+        raw = ev.arguments
+        st = self._item_state(ev.output_index, _FunctionCallState)
+        try:
+            parsed = _ARGS_DECODER.decode(raw)
+        except msgspec.DecodeError:
+            parsed = raw
+        self.final.function_calls.append(
+            {
+                "id": ev.item_id,
+                "output_index": ev.output_index,
+                "name": st.name if st else None,
+                "call_id": st.call_id if st else None,
+                "arguments": parsed,
+                "arguments_raw": raw,
+            }
+        )
+
+    async def _h_custom_input_delta(self, ev: ResponseCustomToolCallInputDelta):
+        if (st := self._item_state(ev.output_index, _CustomToolCallState)):
+            st.chunks.append(ev.delta)
+        if self._emit_enabled:
+            await self._emit(Delta(kind="custom.input", output_index=ev.output_index, item_id=ev.item_id, text=ev.delta))
+
+    async def _h_custom_input_done(self, ev: ResponseCustomToolCallInputDone):
+        st = self._item_state(ev.output_index, _CustomToolCallState)
+        self.final.custom_tool_calls.append(
+            {
+                "id": ev.item_id,
+                "output_index": ev.output_index,
+                "name": st.name if st else None,
+                "call_id": st.call_id if st else None,
+                "input": ev.input
+            }
+        )
+
+    async def _h_item_done(self, ev: ResponseOutputItemDone):
+        if self._emit_enabled:
+            await self._emit(Delta(kind="item.completed", output_index=ev.output_index, item_id=ev.item.get("id"), meta={"item": ev.item}))
+
+    async def _h_completed(self, ev: ResponseCompleted):
+        resp = ev.response
+        self.final.snapshot = resp
+        self.final.response_id = resp.id
+        self.final.status = resp.status
+        self.final.model = resp.model
+        self.final.usage = resp.usage
+        if self._emit_enabled:
+            await self._emit(Delta(kind="response.status", status=resp.status))
+
+    # Fallbacks for when the typed function/custom events fail to decode (schema drift)
+    async def _h_unknown(self, ev: UnknownEvent):
+        handler = self._unknown_dispatch.get(ev.type)
+        if handler is not None:
+            await handler(ev.__raw__)
+        elif self._emit_enabled:
+            # Forward other unknowns for debugging if desired
+            await self._emit(Delta(kind="unknown", meta=ev.__raw__))
+
+    async def _u_fn_args_delta(self, raw: Dict[str, Any]):
+        item_id = raw.get("item_id")
+        oi = raw.get("output_index")
+        delta = raw.get("delta", "")
+        if (st := self._item_state(oi, _FunctionCallState)) is not None:
+            st.chunks.append(delta)
+        if self._emit_enabled:
+            await self._emit(Delta(kind="function.arguments", output_index=oi, item_id=item_id, text=delta))
+
+    async def _u_fn_args_done(self, raw: Dict[str, Any]):
+        item_id = raw.get("item_id")
+        oi = raw.get("output_index")
+        arguments = raw.get("arguments", "")
+        st = self._item_state(oi, _FunctionCallState)
+        try:
+            parsed = _ARGS_DECODER.decode(arguments)
+        except (msgspec.DecodeError, TypeError):
+            parsed = arguments
+        self.final.function_calls.append(
+            {
+                "id": item_id,
+                "output_index": oi,
+                "name": st.name if st else None,
+                "call_id": st.call_id if st else None,
+                "arguments": parsed,
+                "arguments_raw": arguments,
+            }
+        )
+
+    async def _u_custom_input_delta(self, raw: Dict[str, Any]):
+        item_id = raw.get("item_id")
+        oi = raw.get("output_index")
+        delta = raw.get("delta", "")
+        if (st := self._item_state(oi, _CustomToolCallState)) is not None:
+            st.chunks.append(delta)
+        if self._emit_enabled:
+            await self._emit(Delta(kind="custom.input", output_index=oi, item_id=item_id, text=delta))
+
+    async def _u_custom_input_done(self, raw: Dict[str, Any]):
+        item_id = raw.get("item_id")
+        oi = raw.get("output_index")
+        st = self._item_state(oi, _CustomToolCallState)
+        self.final.custom_tool_calls.append(
+            {
+                "id": item_id,
+                "output_index": oi,
+                "name": st.name if st else None,
+                "call_id": st.call_id if st else None,
+                "input": raw.get("input", ""),
+            }
+        )
 
 async def stream_response(byte_iter: AsyncIterator[bytes], on_delta: Optional[AnyDeltaCallback] = None) -> AggregatedResponse:
     agg = ResponseAggregator(on_delta=on_delta)
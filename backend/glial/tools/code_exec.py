@@ -1,3 +1,5 @@
+from functools import lru_cache
+from types import CodeType
 import contextlib
 import traceback
 import json
@@ -7,6 +9,11 @@ import io
 from glial.tools.registry import custom
 
 
+@lru_cache(maxsize=256)
+def _compile(src: str) -> CodeType:
+    return compile(src, "<code_exec>", "exec", dont_inherit=True)
+
+
 @custom(
         "Execute arbitrary Python code. Returns a dictionary with  returncode, stdout and stderr. "
         "Globals and locals are persisted across calls within the same conversation."
@@ -16,7 +23,7 @@ def code_exec(code: str):
     rc = 0
     with contextlib.redirect_stdout(fout), contextlib.redirect_stderr(ferr):
         try:
-            exec(code, code_exec.ref.locals, code_exec.ref.globals)
+            exec(_compile(code), code_exec.ref.exec_ns)
         except Exception:
             ferr.write(traceback.format_exc())
             rc = 1
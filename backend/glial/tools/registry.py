@@ -1,4 +1,6 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import functools
 import importlib.util
 import inspect
 
@@ -18,27 +20,25 @@ def tool(description, **arg_descriptions):
     Decorator that adds JSON .schema attribute for callable functinos
     """
     def inner(func):
+        props, required = {}, []
         schema = {
             "type": "function",
             "name": func.__name__,
             "description": description,
             "parameters": {
                 "type": "object",
-                "properties": {},
-                "required": [],
+                "properties": props,
+                "required": required,
                 "additionalProperties": False
             },
             "strict": True
         }
-        descriptions = list(arg_descriptions.values())
-        annotations = list(inspect.signature(func).parameters.values())
-
-        for desc, anno in list(zip(descriptions, annotations)):
-            schema["parameters"]["properties"][anno.name] = {
-                "type": _PYTHON_TO_JSON_TYPE[anno.annotation.__name__],
+        for desc, param in zip(arg_descriptions.values(), inspect.signature(func).parameters.values()):
+            props[param.name] = {
+                "type": _PYTHON_TO_JSON_TYPE[param.annotation.__name__],
                 "description": desc
             }
-            schema["parameters"]["required"].append(anno.name)
+            required.append(param.name)
 
         func.schema = schema
         return func
@@ -58,30 +58,82 @@ def custom(description):
     return inner
 
 
-def gather_tools(ref):
-    schemas = []
-    tools = {}
-    current_file, current_dir = Path(__file__).name, Path(__file__).parent
-    for py_file in current_dir.glob("*.py"):
-        if py_file.name == current_file:
-            continue
+# Loaded tool modules: path -> (mtime_ns, module)
+_MODULE_CACHE = {}
+# frozenset of (file name, mtime_ns) -> (schemas, unbound tools)
+_TOOLS_CACHE = {}
+
+
+def _bind_ref(func, ref):
+    """
+    Per-caller wrapper for a shared custom tool that points func.ref at `ref`
+    for the duration of each call (async tools must read it before awaiting)
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def bound(*args, **kwargs):
+            func.ref = ref
+            return await func(*args, **kwargs)
+    else:
+        @functools.wraps(func)
+        def bound(*args, **kwargs):
+            func.ref = ref
+            return func(*args, **kwargs)
+    return bound
 
-        module_name = "tools." + py_file.stem
-        spec = importlib.util.spec_from_file_location(module_name, py_file)
 
-        module = importlib.util.module_from_spec(spec)  # type: ignore
-        spec.loader.exec_module(module)  # type: ignore
+def _load_module(py_file, mtime_ns):
+    cached = _MODULE_CACHE.get(py_file)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+
+    module_name = "tools." + py_file.stem
+    spec = importlib.util.spec_from_file_location(module_name, py_file)
+
+    module = importlib.util.module_from_spec(spec)  # type: ignore
+    spec.loader.exec_module(module)  # type: ignore
+    _MODULE_CACHE[py_file] = (mtime_ns, module)
+    return module
+
+
+def gather_tools(ref):
+    current_file, current_dir = Path(__file__).name, Path(__file__).parent
+    py_files = [
+        (py_file, py_file.stat().st_mtime_ns)
+        for py_file in current_dir.glob("*.py")
+        if py_file.name != current_file
+    ]
+    key = frozenset((py_file.name, mtime_ns) for py_file, mtime_ns in py_files)
 
-        # find functions with a .schema or .custom attribute
-        for name, obj in vars(module).items():
-            if inspect.isfunction(obj) or inspect.iscoroutinefunction(obj):
-                if hasattr(obj, "schema"):
-                    schemas.append(obj.schema)  # type: ignore
-                    tools[name] = obj
-                elif hasattr(obj, "custom"):
-                    obj.ref = ref
-                    schemas.append(obj.custom)
-                    tools[name] = obj
+    cached = _TOOLS_CACHE.get(key)
+    if cached is None:
+        schemas = []
+        tools = {}
+        # Tool modules are independent, so load them concurrently; the scan below
+        # stays serial and in file order.
+        if len(py_files) > 1:
+            with ThreadPoolExecutor(max_workers=min(8, len(py_files))) as ex:
+                modules = list(ex.map(lambda f: _load_module(*f), py_files))
+        else:
+            modules = [_load_module(*f) for f in py_files]
 
-    return schemas, tools
+        for module in modules:
+            # find functions with a .schema or .custom attribute
+            for name, obj in vars(module).items():
+                if inspect.isfunction(obj) or inspect.iscoroutinefunction(obj):
+                    if hasattr(obj, "schema"):
+                        schemas.append(obj.schema)  # type: ignore
+                        tools[name] = obj
+                    elif hasattr(obj, "custom"):
+                        schemas.append(obj.custom)
+                        tools[name] = obj
+        _TOOLS_CACHE.clear()
+        cached = _TOOLS_CACHE[key] = (schemas, tools)
 
+    # Tool functions are shared between callers; custom tools get a wrapper that
+    # hands them this caller's ref.
+    schemas, tools = cached
+    return list(schemas), {
+        name: _bind_ref(func, ref) if hasattr(func, "custom") else func
+        for name, func in tools.items()
+    }
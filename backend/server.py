@@ -2,34 +2,149 @@
 import os
 import json
 import asyncio
-from typing import Dict, Optional, Any
+import functools
+import itertools
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Any, Tuple
 
 from aiohttp import web
 from aiohttp.client_exceptions import ClientConnectionError
+import msgspec
 
-from glial.agent import Agent
+from glial.agent import Agent, close_shared_session, configure_loop
 from glial.streaming import Delta
+from glial.tools.registry import gather_tools
 from storage import Storage
 
+# --------------------------------------------------------------------------------------
+# Session cache
+# --------------------------------------------------------------------------------------
+class AgentCache:
+    """
+    In-memory agents keyed by session id: LRU-capped at `maxsize` and expired
+    after `ttl` seconds idle. Conversation agents re-hydrate from the DB when
+    they're next used, so evicting them only costs a reload. Sessions pinned
+    by an in-flight round are never evicted (their new items aren't persisted
+    yet); if everything is pinned the cache runs over `maxsize` until a later
+    insert or sweep can trim it.
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float = 1800):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Agent]]" = OrderedDict()
+        self._pinned: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, session_id: str) -> Optional[Agent]:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        self._entries[session_id] = (time.monotonic(), entry[1])
+        self._entries.move_to_end(session_id)
+        return entry[1]
+
+    def __setitem__(self, session_id: str, agent: Agent):
+        self._entries[session_id] = (time.monotonic(), agent)
+        self._entries.move_to_end(session_id)
+        self._trim()
+
+    def pin(self, session_id: str):
+        self._pinned[session_id] = self._pinned.get(session_id, 0) + 1
+
+    def unpin(self, session_id: str):
+        n = self._pinned.pop(session_id, 0) - 1
+        if n > 0:
+            self._pinned[session_id] = n
+
+    def sweep(self):
+        """Evict unpinned agents idle for longer than the TTL (oldest entries come first)."""
+        cutoff = time.monotonic() - self.ttl
+        for session_id, (last_used, _) in list(self._entries.items()):
+            if last_used >= cutoff:
+                break
+            if session_id not in self._pinned:
+                del self._entries[session_id]
+        self._trim()
+
+    def _trim(self):
+        """Drop least recently used, unpinned agents until within maxsize."""
+        excess = len(self._entries) - self.maxsize
+        if excess <= 0:
+            return
+        victims = list(itertools.islice((sid for sid in self._entries if sid not in self._pinned), excess))
+        for session_id in victims:
+            del self._entries[session_id]
+
+# --------------------------------------------------------------------------------------
+# Admission control
+# --------------------------------------------------------------------------------------
+class StreamAdmission:
+    """
+    Caps the number of concurrent upstream streams. Built on a Condition over a
+    counter rather than a Semaphore so `resize` can change the limit at runtime.
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def release(self):
+        async with self._cond:
+            self.active -= 1
+            self._cond.notify(1)
+
+    async def resize(self, limit: int):
+        async with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
 # --------------------------------------------------------------------------------------
 # Globals
 # --------------------------------------------------------------------------------------
-SESSIONS: Dict[str, Agent] = {}  # per-session agents in memory
+ADMISSION = StreamAdmission(int(os.getenv("MAX_CONCURRENT_STREAMS", "64")))
+SESSIONS = AgentCache(
+    maxsize=int(os.getenv("MAX_SESSIONS", "1024")),
+    ttl=float(os.getenv("SESSION_TTL", "1800")),
+)
+_SWEEP_INTERVAL = 60
 DB_PATH = os.getenv("DB_PATH", "./data/app.sqlite3")
 STORE = Storage(DB_PATH)
+# Storage opens one connection per thread, so a dedicated, small pool bounds how
+# many connections (and per-connection page caches) exist; SQLite serializes
+# writers anyway, so more threads wouldn't add write throughput.
+_DB_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DB_WORKERS", "4")),
+    thread_name_prefix="sqlite",
+)
+_JSON = msgspec.json.Encoder()
 
 # --------------------------------------------------------------------------------------
 # CORS helpers
 # --------------------------------------------------------------------------------------
-def cors_headers_for(request: web.Request) -> dict:
-    origin = request.headers.get("Origin", "*")
-    return {
-        "Access-Control-Allow-Origin": origin,
-        "Vary": "Origin",
-        "Access-Control-Allow-Methods": "GET,POST,PATCH,OPTIONS",
-        "Access-Control-Allow-Headers": "Content-Type,Authorization",
-        "Access-Control-Allow-Credentials": "true",
-    }
+_STATIC_CORS = {
+    "Vary": "Origin",
+    "Access-Control-Allow-Methods": "GET,POST,PATCH,OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type,Authorization",
+    "Access-Control-Allow-Credentials": "true",
+}
+
+@functools.lru_cache(maxsize=64)
+def _cors_headers(origin: str) -> Dict[str, str]:
+    return {"Access-Control-Allow-Origin": origin, **_STATIC_CORS}
+
+def cors_headers_for(request: web.Request) -> Dict[str, str]:
+    """CORS headers for the request's Origin; the dict is shared, so don't mutate it."""
+    return _cors_headers(request.headers.get("Origin", "*"))
 
 @web.middleware
 async def cors_mw(request, handler):
@@ -57,7 +172,7 @@ async def health(_request: web.Request):
 async def list_conversations(request: web.Request):
     limit = int(request.query.get("limit", "50"))
     offset = int(request.query.get("offset", "0"))
-    data = STORE.list_conversations(limit=limit, offset=offset)
+    data = await _db(STORE.list_conversations, limit=limit, offset=offset)
     return web.json_response({"conversations": data})
 
 async def create_conversation(request: web.Request):
@@ -67,13 +182,13 @@ async def create_conversation(request: web.Request):
         body = {}
     title = body.get("title")
     settings = body.get("settings")
-    conv_id = STORE.create_conversation(title=title, settings=settings)
-    conv = STORE.get_conversation(conv_id) or {"id": conv_id, "title": title}
+    conv_id = await _db(STORE.create_conversation, title=title, settings=settings)
+    conv = await _db(STORE.get_conversation, conv_id) or {"id": conv_id, "title": title}
     return web.json_response(conv, status=201)
 
 async def get_conversation(request: web.Request):
     conv_id = request.match_info["conv_id"]
-    conv = STORE.get_conversation(conv_id)
+    conv = await _db(STORE.get_conversation, conv_id)
     if not conv:
         raise web.HTTPNotFound(
             text=json.dumps({"error": "not found"}),
@@ -83,8 +198,7 @@ async def get_conversation(request: web.Request):
 
 async def patch_conversation(request: web.Request):
     conv_id = request.match_info["conv_id"]
-    conv = STORE.get_conversation(conv_id)
-    if not conv:
+    if not await _db(STORE.conversation_exists, conv_id):
         raise web.HTTPNotFound(
             text=json.dumps({"error": "not found"}),
             content_type="application/json",
@@ -95,31 +209,100 @@ async def patch_conversation(request: web.Request):
         body = {}
     title = body.get("title", None)
     settings = body.get("settings", None)
+    await _db(STORE.update_conversation, conv_id, title=title, settings=settings)
 
-    updates = []
-    params: list[Any] = []
-    if title is not None:
-        updates.append("title=?")
-        params.append(title)
-    if settings is not None:
-        updates.append("settings=?")
-        params.append(json.dumps(settings, ensure_ascii=False))
-    if updates:
-        import time as _t
-        updates.append("updated_at=?")
-        params.append(int(_t.time()))
-        STORE.conn.execute(f"UPDATE conversations SET {', '.join(updates)} WHERE id=?", (*params, conv_id))
-
-    conv2 = STORE.get_conversation(conv_id) or {"id": conv_id, "title": title}
+    conv2 = await _db(STORE.get_conversation, conv_id) or {"id": conv_id, "title": title}
     return web.json_response(conv2)
 
 # --------------------------------------------------------------------------------------
 # Shared SSE streaming helper
 # --------------------------------------------------------------------------------------
+# Pre-encoded frame prefixes for the event kinds the aggregator and this module emit
+_EVENT_HEADERS: Dict[str, bytes] = {
+    k: f"event: {k}\ndata: ".encode("utf-8")
+    for k in (
+        "text", "reasoning", "function.arguments", "custom.input",
+        "item.started", "item.completed", "response.status", "unknown",
+        "response.usage", "error",
+    )
+}
+
+async def _db(fn, *args, **kwargs):
+    """Run a blocking Storage call on the DB thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_DB_EXECUTOR, functools.partial(fn, *args, **kwargs))
+
+def _sse_frame(kind: str, payload: Any) -> bytes:
+    """Complete `event:` + `data:` frame, written with a single resp.write."""
+    header = _EVENT_HEADERS.get(kind) or f"event: {kind}\ndata: ".encode("utf-8")
+    return header + _JSON.encode(payload) + b"\n\n"
+
+def _accepts_gzip(request: web.Request) -> bool:
+    for token in request.headers.get("Accept-Encoding", "").split(","):
+        name, _, params = token.partition(";")
+        if name.strip().lower() == "gzip":
+            q = params.strip().lower()
+            try:
+                return not (q.startswith("q=") and float(q[2:]) == 0)
+            except ValueError:
+                return False
+    return False
+
+class _FrameWriter:
+    """
+    Writes SSE frames from a background task. Frames queued while a write is in
+    flight are coalesced and shipped together in the next resp.write.
+    """
+    def __init__(self, resp: web.StreamResponse, gzip: bool = False, max_pending: int = 256):
+        self.resp = resp
+        self.open = True  # False once the client has gone away
+        # Sync-flushed after every write so the client can decode each batch immediately
+        self._gzip = zlib.compressobj(level=1, wbits=31) if gzip else None
+        self._queue: asyncio.Queue = asyncio.Queue(max_pending)
+        self._task = asyncio.create_task(self._run())
+
+    async def send(self, frame: bytes):
+        if self.open:
+            await self._queue.put(frame)
+
+    async def close(self):
+        """Flush everything queued so far and stop the writer task."""
+        if not self._task.done():
+            await self._queue.put(None)
+            await self._task
+
+    async def _run(self):
+        queue = self._queue
+        while True:
+            frame = await queue.get()
+            done = frame is None
+            buf = bytearray() if done else bytearray(frame)
+            while not done and not queue.empty():
+                frame = queue.get_nowait()
+                if frame is None:
+                    done = True
+                    break
+                buf += frame
+            # keep draining after a disconnect so senders never block on a full queue
+            if self.open:
+                try:
+                    if self._gzip is not None:
+                        # the gzip trailer rides along with the last batch
+                        buf = self._gzip.compress(buf) + self._gzip.flush(
+                            zlib.Z_FINISH if done else zlib.Z_SYNC_FLUSH
+                        )
+                    if buf:
+                        await self.resp.write(buf)
+                except (ConnectionResetError, ClientConnectionError, RuntimeError):
+                    self.open = False
+            if done:
+                return
+
 async def _stream_round(request: web.Request, session_id: str, prompt: str, conv_id: Optional[str] = None):
     if os.getenv("OPENAI_API_KEY", "").strip() == "":
         return web.json_response({"error": "OPENAI_API_KEY not set"}, status=500)
 
+    gzip = _accepts_gzip(request)
     resp = web.StreamResponse(
         status=200,
         reason="OK",
@@ -131,15 +314,18 @@ async def _stream_round(request: web.Request, session_id: str, prompt: str, conv
             **cors_headers_for(request),
         },
     )
+    if gzip:
+        resp.headers["Content-Encoding"] = "gzip"
+        resp.headers["Vary"] = "Origin, Accept-Encoding"
     await resp.prepare(request)
 
-    client_open = True
+    writer = _FrameWriter(resp, gzip=gzip)
     saw_any_stream = False
     saw_completed = False
 
     async def emit(d: Delta):
-        nonlocal client_open, saw_any_stream, saw_completed
-        if not client_open:
+        nonlocal saw_any_stream, saw_completed
+        if not writer.open:
             return
 
         # Proxy upstream deltas to the client
@@ -156,30 +342,34 @@ async def _stream_round(request: web.Request, session_id: str, prompt: str, conv
             "meta": d.meta or {},
         }
 
-        try:
-            await resp.write(f"event: {d.kind}\n".encode("utf-8"))
-            await resp.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
-            saw_any_stream = True
-            if d.kind == "response.status" and d.status == "completed":
-                saw_completed = True
-        except (ConnectionResetError, ClientConnectionError, RuntimeError):
-            client_open = False
+        await writer.send(_sse_frame(d.kind, payload))
+        saw_any_stream = True
+        if d.kind == "response.status" and d.status == "completed":
+            saw_completed = True
 
     # get or create agent; seed from DB if conv-based and first time
     agent = SESSIONS.get(session_id)
     if agent is None:
-        agent = Agent(on_delta=emit)
-        await agent.__aenter__()
+        fresh = Agent(on_delta=emit)
+        await fresh.__aenter__()
         if conv_id:
             try:
-                agent.items = STORE.get_items_for_agent(conv_id)
+                fresh.items = await _db(STORE.get_items_for_agent, conv_id)
             except Exception:
-                agent.items = []
-        SESSIONS[session_id] = agent
-    else:
-        agent.on_delta = emit  # rebind per-HTTP-connection
-
+                fresh.items = []
+        # a concurrent first request may have registered an agent while we hydrated;
+        # keep that one so both turns land in the same transcript
+        agent = SESSIONS.get(session_id)
+        if agent is None:
+            agent = fresh
+            SESSIONS[session_id] = agent
+    agent.on_delta = emit  # rebind per-HTTP-connection
+    SESSIONS.pin(session_id)  # not evictable until this round's items are persisted
+
+    admitted = False
     try:
+        await ADMISSION.acquire()
+        admitted = True
         ret = await agent(prompt)
 
         total_tokens: Optional[int] = None
@@ -190,36 +380,33 @@ async def _stream_round(request: web.Request, session_id: str, prompt: str, conv
         else:
             total_tokens = ret
 
+        # queue usage first so the writer ships it while the DB write runs
+        if total_tokens is not None:
+            usage_payload = {"kind": "response.usage", "total_tokens": total_tokens}
+            await writer.send(_sse_frame("response.usage", usage_payload))
+
         if conv_id and new_items:
             try:
-                STORE.append_messages(conv_id, new_items)
+                await _db(STORE.append_messages, conv_id, new_items)
             except Exception:
                 # don't break streaming on persistence errors
                 pass
 
-        if client_open and total_tokens is not None:
-            usage_payload = {"kind": "response.usage", "total_tokens": total_tokens}
-            try:
-                await resp.write(b"event: response.usage\n")
-                await resp.write(f"data: {json.dumps(usage_payload, ensure_ascii=False)}\n\n".encode("utf-8"))
-            except (ConnectionResetError, ClientConnectionError, RuntimeError):
-                client_open = False
-
     except asyncio.CancelledError:
         # client disconnected mid-stream
         pass
     except Exception as e:
         # Only surface as SSE 'error' if we haven't already completed or streamed output
-        if client_open and not saw_completed and not saw_any_stream:
+        if not saw_completed and not saw_any_stream:
             err = {"message": str(e)}
-            try:
-                await resp.write(b"event: error\n")
-                await resp.write(f"data: {json.dumps(err, ensure_ascii=False)}\n\n".encode("utf-8"))
-            except Exception:
-                pass
+            await writer.send(_sse_frame("error", err))
         # otherwise, swallow the error to avoid noisy bubbles for harmless post-completion issues
     finally:
+        SESSIONS.unpin(session_id)
+        if admitted:
+            await ADMISSION.release()
         try:
+            await writer.close()
             await resp.write_eof()
         except Exception:
             pass
@@ -244,7 +431,7 @@ async def stream_chat(request: web.Request):
 
 async def stream_chat_conversation(request: web.Request):
     conv_id = request.match_info["conv_id"]
-    if not STORE.get_conversation(conv_id):
+    if not await _db(STORE.conversation_exists, conv_id):
         raise web.HTTPNotFound(
             text=json.dumps({"error": "not found"}),
             content_type="application/json",
@@ -264,8 +451,28 @@ async def stream_chat_conversation(request: web.Request):
 # --------------------------------------------------------------------------------------
 # App wiring
 # --------------------------------------------------------------------------------------
+async def _preload_tools(_app: web.Application):
+    # load tool modules now so the first Agent hits gather_tools' cache
+    await asyncio.to_thread(gather_tools, None)
+
+async def _close_http(_app: web.Application):
+    await close_shared_session()
+
+async def _session_sweeper(_app: web.Application):
+    async def sweep_forever():
+        while True:
+            await asyncio.sleep(_SWEEP_INTERVAL)
+            SESSIONS.sweep()
+
+    task = asyncio.create_task(sweep_forever())
+    yield
+    task.cancel()
+
 def create_app():
     app = web.Application(middlewares=[cors_mw])
+    app.on_startup.append(_preload_tools)
+    app.cleanup_ctx.append(_session_sweeper)
+    app.on_cleanup.append(_close_http)
     app.add_routes([
         web.get("/healthz", health),
 
@@ -286,6 +493,7 @@ def create_app():
     return app
 
 if __name__ == "__main__":
+    configure_loop()
     web.run_app(
         create_app(),
         host=os.getenv("HOST", "0.0.0.0"),
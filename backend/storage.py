@@ -1,13 +1,17 @@
 # backend/storage.py
 from __future__ import annotations
 
-import json
+import itertools
 import os
+import secrets
 import sqlite3
+import threading
 import time
-import uuid
+from contextlib import contextmanager
 from typing import Any, Dict, List, Optional, Tuple
 
+import msgspec
+
 
 DEFAULT_SETTINGS: Dict[str, Any] = {
     "model": "gpt-5",
@@ -17,15 +21,44 @@ DEFAULT_SETTINGS: Dict[str, Any] = {
 }
 
 
+_ENCODER = msgspec.json.Encoder()
+_DECODER = msgspec.json.Decoder()
+
+
+def _dumps(obj: Any) -> str:
+    return _ENCODER.encode(obj).decode("utf-8")
+
+
 def _now() -> int:
     return int(time.time())
 
 
+# Message ids only need to be unique, not unguessable: time + per-process random
+# prefix + counter, so a batch insert doesn't read /dev/urandom once per row.
+_ID_PREFIX = secrets.token_hex(4)
+_ID_COUNTER = itertools.count()
+
+
+def _message_id() -> str:
+    return f"{_now():08x}{_ID_PREFIX}{next(_ID_COUNTER) & 0xFFFFFFFF:08x}"
+
+
 def _connect(db_path: str) -> sqlite3.Connection:
-    conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False, cached_statements=256)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA foreign_keys=ON;")
+    # WAL + NORMAL only fsyncs at checkpoints; a crash can lose the last commits, never corrupt
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+    # Sized per connection: there is one per thread using the Storage (the server's
+    # DB pool is DB_WORKERS threads, default 4, plus the startup thread), so
+    # budget about (workers + 1) x 16 MiB of page cache. The mmap window is
+    # file-backed and shared through the OS page cache, so it costs address
+    # space per connection rather than private memory.
+    conn.execute("PRAGMA cache_size=-16384;")  # 16 MiB page cache
+    conn.execute("PRAGMA wal_autocheckpoint=2000;")
+    conn.execute("PRAGMA mmap_size=268435456;")  # 256 MiB
     return conn
 
 
@@ -33,9 +66,17 @@ class Storage:
     def __init__(self, db_path: str = "./data/app.sqlite3"):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        self.conn = _connect(db_path)
+        self._local = threading.local()
         self._init_schema()
 
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connection for the calling thread; each thread lazily opens its own (WAL allows concurrent readers)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.db_path)
+        return conn
+
     def _init_schema(self):
         c = self.conn.cursor()
         c.execute(
@@ -45,7 +86,9 @@ class Storage:
               created_at INTEGER NOT NULL,
               updated_at INTEGER NOT NULL,
               title TEXT,
-              settings TEXT NOT NULL
+              settings TEXT NOT NULL,
+              message_count INTEGER NOT NULL DEFAULT 0,
+              next_idx INTEGER NOT NULL DEFAULT 0
             );
             """
         )
@@ -61,26 +104,78 @@ class Storage:
             );
             """
         )
+        if self._add_column(c, "conversations", "message_count", "INTEGER NOT NULL DEFAULT 0"):
+            c.execute(
+                "UPDATE conversations SET message_count = "
+                "(SELECT COUNT(*) FROM messages m WHERE m.conversation_id = conversations.id)"
+            )
+        if self._add_column(c, "conversations", "next_idx", "INTEGER NOT NULL DEFAULT 0"):
+            c.execute(
+                "UPDATE conversations SET next_idx = "
+                "(SELECT COALESCE(MAX(idx), -1) + 1 FROM messages m WHERE m.conversation_id = conversations.id)"
+            )
+        c.execute("CREATE INDEX IF NOT EXISTS idx_messages_conv ON messages(conversation_id, idx);")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_conv_updated ON conversations(updated_at DESC);")
         c.close()
 
+    @staticmethod
+    def _add_column(c: sqlite3.Cursor, table: str, column: str, decl: str) -> bool:
+        """Add a column to a table created by an older schema; True if it was missing."""
+        cols = {r["name"] for r in c.execute(f"PRAGMA table_info({table})").fetchall()}
+        if column in cols:
+            return False
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        return True
+
+    @contextmanager
+    def _transaction(self):
+        """Explicit write transaction on the autocommit connection (one commit, one fsync)."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
     # -------- Conversations --------
     def create_conversation(self, title: Optional[str] = None,
                             settings: Optional[Dict[str, Any]] = None) -> str:
-        conv_id = uuid.uuid4().hex
+        conv_id = secrets.token_hex(16)  # the id is the only access check, so keep it random
         ts = _now()
-        settings_json = json.dumps(settings or DEFAULT_SETTINGS, ensure_ascii=False)
+        settings_json = _dumps(settings or DEFAULT_SETTINGS)
         self.conn.execute(
             "INSERT INTO conversations (id, created_at, updated_at, title, settings) VALUES (?,?,?,?,?)",
             (conv_id, ts, ts, title, settings_json),
         )
         return conv_id
 
+    def conversation_exists(self, conv_id: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM conversations WHERE id=? LIMIT 1", (conv_id,)
+        ).fetchone() is not None
+
+    def update_conversation(self, conv_id: str, title: Optional[str] = None,
+                            settings: Optional[Dict[str, Any]] = None) -> None:
+        updates: List[str] = []
+        params: List[Any] = []
+        if title is not None:
+            updates.append("title=?")
+            params.append(title)
+        if settings is not None:
+            updates.append("settings=?")
+            params.append(_dumps(settings))
+        if not updates:
+            return
+        updates.append("updated_at=?")
+        params.append(_now())
+        self.conn.execute(f"UPDATE conversations SET {', '.join(updates)} WHERE id=?", (*params, conv_id))
+
     def list_conversations(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
         rows = self.conn.execute(
             """
-            SELECT id, title, created_at, updated_at,
-              (SELECT COUNT(*) FROM messages m WHERE m.conversation_id = c.id) AS message_count
-            FROM conversations c
+            SELECT id, title, created_at, updated_at, message_count
+            FROM conversations
             ORDER BY updated_at DESC
             LIMIT ? OFFSET ?;
             """,
@@ -109,49 +204,51 @@ class Storage:
             "title": conv["title"],
             "created_at": conv["created_at"],
             "updated_at": conv["updated_at"],
-            "settings": json.loads(conv["settings"]),
+            "settings": _DECODER.decode(conv["settings"]),
             "messages": [
                 {
                     "id": r["id"],
                     "idx": r["idx"],
                     "role": r["role"],
-                    "payload": json.loads(r["payload"]),
+                    "payload": _DECODER.decode(r["payload"]),
                 }
                 for r in msgs
             ],
         }
 
-    def get_items_for_agent(self, conv_id: str) -> List[Dict[str, Any]]:
+    def get_items_for_agent(self, conv_id: str) -> List[msgspec.Raw]:
+        """
+        Stored payloads for seeding an Agent, left as raw JSON. The agent only ever
+        re-encodes history into a request body, so nothing is parsed on hydration;
+        the encoder splices the stored text in verbatim.
+        """
         rows = self.conn.execute(
             "SELECT payload FROM messages WHERE conversation_id=? ORDER BY idx ASC",
             (conv_id,),
         ).fetchall()
-        return [json.loads(r["payload"]) for r in rows]
-
-    def _next_index(self, conv_id: str) -> int:
-        row = self.conn.execute(
-            "SELECT COALESCE(MAX(idx), -1) + 1 AS next_idx FROM messages WHERE conversation_id=?",
-            (conv_id,),
-        ).fetchone()
-        return int(row["next_idx"])
+        return [msgspec.Raw(r[0]) for r in rows]
 
-    def append_messages(self, conv_id: str, payloads: List[Dict[str, Any]]) -> None:
-        if not payloads:
+    def append_messages(self, conv_id: str, items: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Persist (role, payload) pairs, as returned in an Agent round's new_items."""
+        if not items:
             return
-        idx = self._next_index(conv_id)
         ts = _now()
-        cur = self.conn.cursor()
-        for p in payloads:
-            msg_id = uuid.uuid4().hex
-            role = p.get("role") or p.get("type") or "unknown"
-            cur.execute(
+        n = len(items)
+        with self._transaction():
+            # Reserve n indexes and bump the counters in one statement
+            row = self.conn.execute(
+                "UPDATE conversations SET next_idx = next_idx + ?, message_count = message_count + ?, "
+                "updated_at=? WHERE id=? RETURNING next_idx",
+                (n, n, ts, conv_id),
+            ).fetchone()
+            if row is None:
+                raise sqlite3.IntegrityError(f"unknown conversation {conv_id}")
+            idx = row["next_idx"] - n
+            rows = [
+                (_message_id(), conv_id, idx + i, role, _dumps(p))
+                for i, (role, p) in enumerate(items)
+            ]
+            self.conn.executemany(
                 "INSERT INTO messages (id, conversation_id, idx, role, payload) VALUES (?,?,?,?,?)",
-                (msg_id, conv_id, idx, role, json.dumps(p, ensure_ascii=False)),
+                rows,
             )
-            idx += 1
-        cur.close()
-        self.conn.execute(
-            "UPDATE conversations SET updated_at=? WHERE id=?",
-            (ts, conv_id),
-        )
-
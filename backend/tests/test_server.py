@@ -0,0 +1,118 @@
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "data", "app.sqlite3"))
+
+import pytest
+import pytest_asyncio
+from aiohttp.test_utils import TestClient, TestServer, make_mocked_request
+
+import server
+from glial.models import Delta
+
+
+class FakeAgent:
+    created = 0
+
+    def __init__(self, on_delta, session=None):
+        FakeAgent.created += 1
+        self.on_delta = on_delta
+        self.items = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def __call__(self, prompt):
+        user = {"role": "user", "content": prompt}
+        self.items.append(user)
+        await self.on_delta(Delta(kind="text", text=prompt))
+        await asyncio.sleep(0.01)
+        reply = {"type": "message", "role": "assistant", "content": prompt}
+        self.items.append(reply)
+        await self.on_delta(Delta(kind="response.status", status="completed"))
+        return {"total_tokens": 1, "new_items": [("user", user), ("assistant", reply)]}
+
+
+@pytest_asyncio.fixture
+async def client(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(server, "Agent", FakeAgent)
+    FakeAgent.created = 0
+    async with TestClient(TestServer(server.create_app())) as c:
+        yield c
+
+
+@pytest.mark.asyncio
+async def test_concurrent_first_requests_share_one_agent(client, monkeypatch):
+    r = await client.post("/v1/conversations", json={"title": "race"})
+    conv_id = (await r.json())["id"]
+
+    hydrate = server.STORE.get_items_for_agent
+
+    def slow_hydrate(cid):
+        time.sleep(0.05)  # keep both requests inside hydration at once
+        return hydrate(cid)
+
+    monkeypatch.setattr(server.STORE, "get_items_for_agent", slow_hydrate)
+
+    async def turn(prompt):
+        r = await client.post(f"/v1/conversations/{conv_id}/stream", json={"prompt": prompt})
+        assert r.status == 200
+        await r.read()
+
+    await asyncio.gather(turn("one"), turn("two"))
+
+    agent = server.SESSIONS.get(conv_id)
+    assert [i["content"] for i in agent.items if i["role"] == "user"] in (["one", "two"], ["two", "one"])
+    assert len(server.STORE.get_conversation(conv_id)["messages"]) == 4
+
+
+def test_agent_cache_keeps_pinned_sessions():
+    cache = server.AgentCache(maxsize=2, ttl=60)
+    cache["a"] = "agent-a"
+    cache.pin("a")
+    cache["b"] = "agent-b"
+    cache["c"] = "agent-c"  # over capacity: evicts "b", the oldest unpinned entry
+    assert cache.get("a") == "agent-a"
+    assert cache.get("b") is None
+
+    cache.ttl = -1  # everything is now idle past the TTL
+    cache.sweep()
+    assert cache.get("a") == "agent-a"
+    assert cache.get("c") is None
+
+    cache.unpin("a")
+    cache.sweep()
+    assert len(cache) == 0
+
+
+
+@pytest.mark.asyncio
+async def test_cancelled_admission_wait_closes_stream(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(server, "Agent", FakeAgent)
+    monkeypatch.setattr(server, "ADMISSION", server.StreamAdmission(0))  # nothing gets admitted
+    writers = []
+
+    class RecordingWriter(server._FrameWriter):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            writers.append(self)
+
+    monkeypatch.setattr(server, "_FrameWriter", RecordingWriter)
+
+    request = make_mocked_request("POST", "/v1/stream")
+    task = asyncio.create_task(server._stream_round(request, session_id="queued", prompt="hi"))
+    while not writers:
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert writers[0]._task.done()
+    assert server.ADMISSION.active == 0
@@ -0,0 +1,105 @@
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from storage import Storage
+
+
+# conversations/messages as created before message_count and next_idx existed
+_BASELINE_SCHEMA = """
+CREATE TABLE conversations (
+  id TEXT PRIMARY KEY,
+  created_at INTEGER NOT NULL,
+  updated_at INTEGER NOT NULL,
+  title TEXT,
+  settings TEXT NOT NULL
+);
+CREATE TABLE messages (
+  id TEXT PRIMARY KEY,
+  conversation_id TEXT NOT NULL,
+  idx INTEGER NOT NULL,
+  role TEXT,
+  payload TEXT NOT NULL,
+  FOREIGN KEY(conversation_id) REFERENCES conversations(id) ON DELETE CASCADE
+);
+"""
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    path = tmp_path / "data" / "app.sqlite3"
+    path.parent.mkdir()
+    conn = sqlite3.connect(path)
+    conn.executescript(_BASELINE_SCHEMA)
+    conn.executemany(
+        "INSERT INTO conversations (id, created_at, updated_at, title, settings) VALUES (?,?,?,?,?)",
+        [("old", 1, 1, "old", "{}"), ("empty", 2, 2, "empty", "{}")],
+    )
+    conn.executemany(
+        "INSERT INTO messages (id, conversation_id, idx, role, payload) VALUES (?,?,?,?,?)",
+        [
+            (f"m{i}", "old", i, "user", json.dumps({"role": "user", "content": str(i)}))
+            for i in range(3)
+        ],
+    )
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+def test_migration_backfills_counters(baseline_db):
+    store = Storage(baseline_db)
+
+    counts = {c["id"]: c["message_count"] for c in store.list_conversations()}
+    assert counts == {"old": 3, "empty": 0}
+
+    store.append_messages("old", [("user", {"role": "user", "content": "3"})])
+    store.append_messages("empty", [("user", {"role": "user", "content": "0"})])
+
+    assert [m["idx"] for m in store.get_conversation("old")["messages"]] == [0, 1, 2, 3]
+    assert [m["idx"] for m in store.get_conversation("empty")["messages"]] == [0]
+
+
+def test_reopen_after_migration(baseline_db):
+    Storage(baseline_db).append_messages("old", [("user", {"role": "user", "content": "3"})])
+
+    # The columns now exist, so a second open skips the ALTERs and keeps the counters
+    store = Storage(baseline_db)
+    counts = {c["id"]: c["message_count"] for c in store.list_conversations()}
+    assert counts == {"old": 4, "empty": 0}
+    store.append_messages("old", [("user", {"role": "user", "content": "4"})])
+    assert [m["idx"] for m in store.get_conversation("old")["messages"]] == [0, 1, 2, 3, 4]
+
+
+def test_append_to_unknown_conversation_fails(tmp_path):
+    store = Storage(str(tmp_path / "data" / "app.sqlite3"))
+
+    with pytest.raises(sqlite3.IntegrityError):
+        store.append_messages("missing", [("user", {"role": "user", "content": "x"})])
+
+
+def test_concurrent_appends_get_distinct_indexes(tmp_path):
+    store = Storage(str(tmp_path / "data" / "app.sqlite3"))
+    conv_id = store.create_conversation("busy")
+    threads, rounds = 8, 25
+
+    def worker(n):
+        # each thread appends through its own per-thread connection
+        for r in range(rounds):
+            store.append_messages(conv_id, [
+                ("user", {"role": "user", "content": f"{n}-{r}"}),
+                ("assistant", {"role": "assistant", "content": f"{n}-{r}"}),
+            ])
+
+    with ThreadPoolExecutor(threads) as ex:
+        list(ex.map(worker, range(threads)))
+
+    messages = store.get_conversation(conv_id)["messages"]
+    total = threads * rounds * 2
+    assert [m["idx"] for m in messages] == list(range(total))
+    # a round's two items are reserved together, so they stay adjacent
+    for user, reply in zip(messages[::2], messages[1::2]):
+        assert user["payload"]["content"] == reply["payload"]["content"]
+    assert store.list_conversations()[0]["message_count"] == total
@@ -0,0 +1,112 @@
+import json
+
+import pytest
+
+from glial.models import ResponseOutputTextDelta, UnknownEvent
+from glial.streaming import _COMPACT_AT, SSEDecoder, stream_response
+
+
+def _text_delta(seq: int, text: str) -> dict:
+    return {
+        "type": "response.output_text.delta",
+        "sequence_number": seq,
+        "item_id": "msg_1",
+        "output_index": 0,
+        "content_index": 0,
+        "delta": text,
+    }
+
+
+def _frame(payload: dict, eol: bytes = b"\n") -> bytes:
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return b"event: " + payload["type"].encode() + eol + b"data: " + data + eol + eol
+
+
+async def _chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+async def _decode(data: bytes, size: int) -> list:
+    return [ev async for ev in SSEDecoder().iter_events(_chunked(data, size))]
+
+
+@pytest.mark.asyncio
+async def test_one_byte_chunks_keep_multibyte_text_intact():
+    texts = ["héllo ", "wörld ", "🙂", "日本語"]
+    stream = b"".join(_frame(_text_delta(i, t)) for i, t in enumerate(texts))
+
+    events = await _decode(stream, 1)
+
+    assert all(type(ev) is ResponseOutputTextDelta for ev in events)
+    assert [ev.delta for ev in events] == texts
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [1, 7, 4096])
+async def test_crlf_line_endings(size):
+    texts = ["a", "b\r\nc", "d"]
+    stream = b"".join(_frame(_text_delta(i, t), eol=b"\r\n") for i, t in enumerate(texts))
+
+    events = await _decode(stream, size)
+
+    assert [ev.delta for ev in events] == texts
+
+
+@pytest.mark.asyncio
+async def test_multi_line_data_is_joined():
+    stream = (
+        b": keep-alive comment\n"
+        b"event: response.output_text.delta\n"
+        b'data: {"type": "response.output_text.delta", "sequence_number": 1,\n'
+        b'data:  "item_id": "msg_1", "output_index": 0, "content_index": 0,\n'
+        b'data: "delta": "joined"}\n'
+        b"\n"
+    )
+
+    for size in (1, 5, len(stream)):
+        events = await _decode(stream, size)
+        assert len(events) == 1
+        assert events[0].delta == "joined"
+
+
+@pytest.mark.asyncio
+async def test_unknown_event_type_falls_back():
+    stream = _frame({"type": "response.something_new", "value": 1})
+
+    (event,) = await _decode(stream, 3)
+
+    assert type(event) is UnknownEvent
+    assert event.type == "response.something_new"
+    assert event.__raw__["value"] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [1000, _COMPACT_AT - 1, _COMPACT_AT + 1])
+async def test_events_straddling_buffer_compaction(size):
+    # Events of varying size, several larger than a chunk, so partial events
+    # are pending whenever the decoder trims the consumed part of its buffer.
+    texts = [f"{i}:" + "é" * (i * 997 % 40_000) for i in range(40)]
+    stream = b"".join(_frame(_text_delta(i, t)) for i, t in enumerate(texts))
+    assert len(stream) > 4 * _COMPACT_AT
+
+    events = await _decode(stream, size)
+
+    assert [ev.delta for ev in events] == texts
+
+
+@pytest.mark.asyncio
+async def test_stream_response_joins_text():
+    core = {"id": "resp_1", "object": "response", "created_at": 0, "status": "completed", "background": False}
+    stream = b"".join(
+        [_frame(_text_delta(i, t)) for i, t in enumerate(["Hel", "lo", "!"])]
+        + [_frame({"type": "response.completed", "sequence_number": 9, "response": core})]
+    )
+    seen = []
+
+    final = await stream_response(_chunked(stream, 2), on_delta=seen.append)
+
+    assert final.text == "Hello!"
+    assert final.status == "completed"
+    assert [d.text for d in seen if d.kind == "text"] == ["Hel", "lo", "!"]
+    assert final.snapshot.id == "resp_1"